@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Response
+from fastapi.responses import StreamingResponse
+import orjson
 from app.services.binance_client import BinanceClient
 from app.repositories.price_cache import PriceCacheRepository
 from app.repositories.candle_repository import CandleRepository
-from app.models.candle import Candle, CandleResponse
+from app.models.candle import CandleResponse
 from app.utils.time import is_supported_interval
 from app.services.coingecko_service import CoinGeckoService
+import asyncio
 import httpx
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/prices", tags=["Prices"])
 
@@ -14,129 +20,186 @@ cache = PriceCacheRepository()
 candle_repo = CandleRepository()
 coingecko = CoinGeckoService()
 
-@router.get("/history", response_model=CandleResponse)
-async def get_price_history(
-    symbol: str = Query(..., example="BTCUSDT"),
-    interval: str = Query(..., example="1m"),
-    limit: int = Query(None, le=2000)
-):
-    """
-    Get historical price candles from TimescaleDB.
-    Falls back to Binance API if symbol not found in DB.
+def normalized_symbol(symbol: str = Query(..., example="BTCUSDT")) -> str:
+    """Canonical uppercase symbol, normalized once at the boundary.
+
+    Keeps cache keys consistent so btcusdt and BTCUSDT don't become two
+    separate Redis entries.
     """
+    return symbol.upper()
+
+
+def validated_interval(interval: str = Query(..., example="1m")) -> str:
+    """Reject unsupported intervals before the handler runs"""
     if not is_supported_interval(interval):
         raise HTTPException(
             status_code=400,
             detail=f"Unsupported interval: {interval}"
         )
+    return interval
+
 
+@router.get("/history", responses={200: {"model": CandleResponse}})
+async def get_price_history(
+    symbol: str = Depends(normalized_symbol),
+    interval: str = Depends(validated_interval),
+    limit: int = Query(None, le=2000)
+):
+    """
+    Get historical price candles from TimescaleDB.
+    Falls back to Binance API if symbol not found in DB.
+    """
     # Auto-calculate optimal limit based on interval if not provided
     if limit is None:
-        limit_map = {
-            "1m": 1000,  # ~16.7 hours
-            "5m": 864,   # 3 days
-            "15m": 672,  # 1 week
-            "1h": 720,   # 30 days
-            "4h": 540,   # 90 days
-            "1d": 365,   # 1 year
-            "1w": 156,   # 3 years
-        }
-        limit = limit_map.get(interval, 500)
+        limit = LIMIT_MAP.get(interval, 500)
 
-    # Check cache first
-    cached = await cache.get(symbol, interval)
+    # Check cache first. The cached value is already serialized JSON, so a
+    # hit goes straight from the Redis buffer to the socket without pydantic
+    # re-validating hundreds of candles.
+    cached = await cache.get_raw(symbol, interval)
     if cached:
-        return cached
+        return Response(content=cached, media_type="application/json")
 
     try:
         # Try to get from TimescaleDB first
         candles_data = await candle_repo.get_candles(symbol, interval, limit)
         
         if candles_data:
-            # Convert to Candle models
+            # Rows are already trusted/typed; plain dicts avoid constructing
+            # (and validating) a Candle model per row.
             candles = [
-                Candle(
-                    open_time=c["open_time"],
-                    open=c["open"],
-                    high=c["high"],
-                    low=c["low"],
-                    close=c["close"],
-                    volume=c["volume"],
-                    close_time=c["close_time"]
-                )
+                {
+                    "open_time": c["open_time"],
+                    "open": c["open"],
+                    "high": c["high"],
+                    "low": c["low"],
+                    "close": c["close"],
+                    "volume": c["volume"],
+                    "close_time": c["close_time"],
+                }
                 for c in candles_data
             ]
-            
-            response = CandleResponse(
-                symbol=symbol.upper(),
-                interval=interval,
-                candles=candles
-            ).dict()
-            
-            # Dynamic TTL based on interval (shorter intervals = shorter cache)
-            ttl_map = {
-                "1m": 5,    # 5 seconds - very fresh data
-                "5m": 10,   # 10 seconds
-                "15m": 30,  # 30 seconds
-                "1h": 60,   # 1 minute
-                "4h": 300,  # 5 minutes
-                "1d": 600,  # 10 minutes
-                "1w": 1800, # 30 minutes
+
+            response = {
+                "symbol": symbol,
+                "interval": interval,
+                "candles": candles,
             }
-            ttl = ttl_map.get(interval, 60)
             
+            ttl = TTL_MAP.get(interval, 60)
+
             # Cache the result with dynamic TTL
             await cache.set(symbol, interval, response, ttl)
+
+            return _candle_response(response)
             
-            return response
-            
-    except Exception as e:
-        print(f"Error fetching from DB: {e}", flush=True)
+    except Exception:
+        logger.exception("Error fetching from DB")
         # Fall through to Binance API fallback
     
-    # Fallback to Binance API if not in DB or error
-    raw_klines = await binance.get_klines(symbol, interval, limit)
+    # Fallback to Binance API if not in DB or error. The client parses the
+    # OHLCV string columns in one vectorized cast instead of 5 float()
+    # calls per row (~5000 interpreter round-trips at limit=1000).
+    open_times, values, close_times = await binance.get_klines_columns(
+        symbol, interval, limit
+    )
 
     candles = [
-        Candle(
-            open_time=k[0],
-            open=float(k[1]),
-            high=float(k[2]),
-            low=float(k[3]),
-            close=float(k[4]),
-            volume=float(k[5]),
-            close_time=k[6]
+        {
+            "open_time": t0,
+            "open": v[0],
+            "high": v[1],
+            "low": v[2],
+            "close": v[3],
+            "volume": v[4],
+            "close_time": t6,
+        }
+        for t0, v, t6 in zip(
+            open_times.tolist(), values.tolist(), close_times.tolist()
         )
-        for k in raw_klines
     ]
 
-    response = CandleResponse(
-        symbol=symbol.upper(),
-        interval=interval,
-        candles=candles
-    ).dict()
-
-    # Dynamic TTL based on interval
-    ttl_map = {
-        "1m": 5, "5m": 10, "15m": 30, "1h": 60,
-        "4h": 300, "1d": 600, "1w": 1800,
+    response = {
+        "symbol": symbol,
+        "interval": interval,
+        "candles": candles,
     }
-    ttl = ttl_map.get(interval, 60)
-    
+
+    ttl = TTL_MAP.get(interval, 60)
+
     await cache.set(symbol, interval, response, ttl)
 
+    return _candle_response(response)
+
+# Default number of candles per interval when the client doesn't pass limit
+LIMIT_MAP = {
+    "1m": 1000,  # ~16.7 hours
+    "5m": 864,   # 3 days
+    "15m": 672,  # 1 week
+    "1h": 720,   # 30 days
+    "4h": 540,   # 90 days
+    "1d": 365,   # 1 year
+    "1w": 156,   # 3 years
+}
+
+# Dynamic cache TTL per interval (shorter intervals = fresher data)
+TTL_MAP = {
+    "1m": 5,    # 5 seconds - very fresh data
+    "5m": 10,   # 10 seconds
+    "15m": 30,  # 30 seconds
+    "1h": 60,   # 1 minute
+    "4h": 300,  # 5 minutes
+    "1d": 600,  # 10 minutes
+    "1w": 1800, # 30 minutes
+}
+
+# Ticker data only needs to be seconds-fresh; a short TTL turns a burst of
+# inbound requests into one Binance call per TTL window.
+TICKER_CACHE_TTL = 3
+
+# Stream history responses above this many candles (~150 KB of JSON) so the
+# first bytes hit the wire while later candles are still being serialized
+STREAM_THRESHOLD = 1000
+
+
+def _stream_candle_response(response: dict, chunk_size: int = 200):
+    """Yield the history response JSON in chunks of serialized candles"""
+    head = orjson.dumps(
+        {k: v for k, v in response.items() if k != "candles"}
+    )
+    yield head[:-1] + b',"candles":['
+
+    candles = response["candles"]
+    for i in range(0, len(candles), chunk_size):
+        chunk = orjson.dumps(candles[i:i + chunk_size])[1:-1]
+        yield b"," + chunk if i else chunk
+
+    yield b"]}"
+
+
+def _candle_response(response: dict):
+    """Return the history payload, streaming it when it is large"""
+    if len(response["candles"]) >= STREAM_THRESHOLD:
+        return StreamingResponse(
+            _stream_candle_response(response),
+            media_type="application/json"
+        )
     return response
 
+
 @router.get("/ticker/{symbol}")
 async def get_ticker_24h(symbol: str):
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"https://api.binance.com/api/v3/ticker/24hr?symbol={symbol}"
-            )
-            if response.status_code != 200:
-                raise HTTPException(status_code=500, detail="Failed to fetch ticker")
-            return response.json()
+        cache_key = f"ticker:24hr:{symbol}"
+        cached = await cache.get_json(cache_key)
+        if cached:
+            return cached
+
+        ticker = await binance.get_ticker(symbol)
+        await cache.set_json(cache_key, ticker, TICKER_CACHE_TTL)
+        return ticker
+    except httpx.HTTPStatusError:
+        raise HTTPException(status_code=500, detail="Failed to fetch ticker")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -169,30 +232,63 @@ async def get_current_candle(
         # If not in Redis, return None (frontend will handle)
         return None
         
-    except Exception as e:
-        print(f"Error fetching current candle: {e}", flush=True)
+    except Exception:
+        logger.exception("Error fetching current candle")
         return None
 
 
+async def _fetch_tickers(symbols):
+    """Fetch 24h tickers one request per symbol, concurrently."""
+    tasks = [binance.get_ticker(symbol) for symbol in symbols]
+    tickers = await asyncio.gather(*tasks, return_exceptions=True)
+    return [t for t in tickers if not isinstance(t, Exception)]
+
+
 @router.get("/market-overview")
 async def get_market_overview():
     try:
         symbols = ["BTCUSDT", "ETHUSDT", "BNBUSDT", "SOLUSDT", "ADAUSDT"]
+
+        cached = await cache.get_json("market:overview")
+        if cached:
+            return cached
+
+        # One Redis round-trip for all per-symbol ticker entries (shared
+        # with the /ticker/{symbol} endpoint)
+        cached_tickers = await cache.mget_json(
+            [f"ticker:24hr:{symbol}" for symbol in symbols]
+        )
+        tickers = dict(zip(symbols, cached_tickers))
+
+        missing = [symbol for symbol in symbols if tickers[symbol] is None]
+        if missing:
+            # Batch endpoint: all misses in one HTTP round-trip.
+            try:
+                fetched = await binance.get_tickers(missing)
+            except httpx.HTTPError:
+                # Fallback: fan out one request per symbol concurrently.
+                fetched = await _fetch_tickers(missing)
+
+            # Write the fresh tickers back in one pipelined round-trip
+            await cache.set_json_many(
+                {f"ticker:24hr:{t['symbol']}": t for t in fetched},
+                TICKER_CACHE_TTL
+            )
+            for ticker in fetched:
+                tickers[ticker["symbol"]] = ticker
+
         results = []
-        
-        async with httpx.AsyncClient() as client:
-            for symbol in symbols:
-                response = await client.get(
-                    f"https://api.binance.com/api/v3/ticker/24hr?symbol={symbol}"
-                )
-                if response.status_code == 200:
-                    ticker = response.json()
-                    results.append({
-                        "symbol": ticker["symbol"],
-                        "price": float(ticker["lastPrice"]),
-                        "change": float(ticker["priceChangePercent"])
-                    })
-        
+        for symbol in symbols:
+            ticker = tickers.get(symbol)
+            if ticker:
+                results.append({
+                    "symbol": ticker["symbol"],
+                    "price": float(ticker["lastPrice"]),
+                    "change": float(ticker["priceChangePercent"])
+                })
+
+        if results:
+            await cache.set_json("market:overview", results, TICKER_CACHE_TTL)
         return results
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,6 +1,10 @@
+import logging
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.price import router as price_router
+from app.api.price import router as price_router, binance, coingecko
+
+logging.basicConfig(level=logging.INFO)
 
 app = FastAPI(
     title="Price History Service",
@@ -18,6 +22,12 @@ app.add_middleware(
 
 app.include_router(price_router)
 
+@app.on_event("shutdown")
+async def shutdown_http_clients():
+    await binance.close()
+    await coingecko.close()
+
+
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
@@ -2,15 +2,28 @@
 Repository for querying candle data from TimescaleDB
 """
 from typing import List, Optional
-from datetime import datetime
-import time
+import asyncio
+import logging
+import numpy as np
+import orjson
 from sqlalchemy import text
-from app.database import async_session
+from app.database import engine
 from app.repositories.price_cache import PriceCacheRepository
 
+logger = logging.getLogger(__name__)
+
 # Global cache instance
 cache = PriceCacheRepository()
 
+# coin ids never change once assigned, so an unbounded in-process map is
+# safe for the small coin universe and saves a DB round-trip per request
+_coin_id_cache: dict = {}
+
+# Minutes per aggregated timeframe
+TIMEFRAME_MINUTES = {
+    "5m": 5, "15m": 15, "1h": 60, "4h": 240, "1d": 1440, "1w": 10080
+}
+
 
 class CandleRepository:
     """Repository for candle data operations"""
@@ -27,94 +40,233 @@ class CandleRepository:
     }
     
     async def get_coin_id(self, symbol: str) -> Optional[int]:
-        """Get coin ID by symbol"""
-        async with async_session() as session:
-            result = await session.execute(
+        """Get coin ID by symbol (cached in-process after the first lookup)"""
+        coin_id = _coin_id_cache.get(symbol)
+        if coin_id is not None:
+            return coin_id
+
+        async with engine.connect() as conn:
+            result = await conn.execute(
                 text("SELECT id FROM coins WHERE symbol = :symbol"),
                 {"symbol": symbol}
             )
             row = result.fetchone()
-            return row.id if row else None
+            if row is None:
+                # Don't cache misses: the coin may be added later
+                return None
+            _coin_id_cache[symbol] = row.id
+            return row.id
     
     def _aggregate_1m_candles(self, candles_1m: List[dict], interval: str, limit: int) -> List[dict]:
         """
         Aggregate 1m candles into higher timeframes in-memory
-        Same logic as aggregator.py for consistency
-        
+        Same bucket logic as aggregator.py for consistency, but vectorized:
+        the per-candle dict loop is replaced by structure-of-arrays NumPy
+        columns reduced with ufunc.reduceat, so the whole aggregation runs
+        in a handful of C-level passes instead of N Python iterations.
+
         Args:
             candles_1m: List of 1m candles sorted by timestamp ASC
             interval: Target timeframe (5m, 15m, 1h, 4h, 1d, 1w)
             limit: Number of aggregated candles to return
-            
+
         Returns:
             List of aggregated candles
         """
-        from datetime import datetime, timezone
-        
-        TIMEFRAME_MINUTES = {
-            "5m": 5, "15m": 15, "1h": 60, "4h": 240, "1d": 1440, "1w": 10080
-        }
-        
         interval_minutes = TIMEFRAME_MINUTES.get(interval)
-        if not interval_minutes:
+        if not interval_minutes or not candles_1m:
             return []
-        
-        # Group 1m candles by target timeframe bucket
-        aggregated = {}
-        
-        for candle in candles_1m:
-            # Get bucket start time for this interval
-            timestamp_ms = int(candle['time']) * 1000
-            
-            # Special handling for 1w to align with Monday
-            if interval == "1w":
-                offset_ms = 345600 * 1000  # 4 days in ms
-                interval_ms = interval_minutes * 60 * 1000
-                bucket_start_ms = ((timestamp_ms - offset_ms) // interval_ms) * interval_ms + offset_ms
-            else:
-                bucket_start_ms = (timestamp_ms // (interval_minutes * 60 * 1000)) * (interval_minutes * 60 * 1000)
-                
-            bucket_start = bucket_start_ms // 1000  # Back to seconds
-            
-            if bucket_start not in aggregated:
-                aggregated[bucket_start] = {
-                    'time': bucket_start,
-                    'open': candle['open'],
-                    'high': candle['high'],
-                    'low': candle['low'],
-                    'close': candle['close'],
-                    'volume': candle['volume']
-                }
-            else:
-                agg = aggregated[bucket_start]
-                agg['high'] = max(agg['high'], candle['high'])
-                agg['low'] = min(agg['low'], candle['low'])
-                agg['close'] = candle['close']  # Last close
-                agg['volume'] += candle['volume']
-        
-        # Sort by time and return last N candles
-        result = sorted(aggregated.values(), key=lambda x: x['time'])
+
+        n = len(candles_1m)
+
+        # AoS -> SoA: one contiguous column per field
+        times = np.fromiter((int(c['time']) for c in candles_1m), np.int64, count=n)
+        opens = np.fromiter((c['open'] for c in candles_1m), np.float64, count=n)
+        highs = np.fromiter((c['high'] for c in candles_1m), np.float64, count=n)
+        lows = np.fromiter((c['low'] for c in candles_1m), np.float64, count=n)
+        closes = np.fromiter((c['close'] for c in candles_1m), np.float64, count=n)
+        volumes = np.fromiter((c['volume'] for c in candles_1m), np.float64, count=n)
+
+        bucket_sec = interval_minutes * 60
+
+        # Special handling for 1w to align with Monday (epoch is a Thursday)
+        if interval == "1w":
+            offset = 345600  # 4 days in seconds
+            buckets = (times - offset) // bucket_sec * bucket_sec + offset
+        else:
+            buckets = times // bucket_sec * bucket_sec
+
+        # Input is time-sorted, so buckets are non-decreasing: each bucket is
+        # a contiguous run. reduceat folds every run in a single C pass.
+        starts = np.flatnonzero(np.diff(buckets)) + 1
+        starts = np.concatenate(([0], starts))
+        last_of_bucket = np.append(starts[1:] - 1, n - 1)
+
+        agg_time = buckets[starts].tolist()
+        agg_open = opens[starts].tolist()
+        agg_high = np.maximum.reduceat(highs, starts).tolist()
+        agg_low = np.minimum.reduceat(lows, starts).tolist()
+        agg_close = closes[last_of_bucket].tolist()
+        agg_volume = np.add.reduceat(volumes, starts).tolist()
+
+        result = [
+            {
+                'time': t,
+                'open': o,
+                'high': h,
+                'low': l,
+                'close': c,
+                'volume': v
+            }
+            for t, o, h, l, c, v in zip(
+                agg_time, agg_open, agg_high, agg_low, agg_close, agg_volume
+            )
+        ]
         return result[-limit:] if len(result) > limit else result
     
+    def _merge_current_candle(self, candles: List[dict], current_1m: dict, interval: str) -> None:
+        """
+        Fold the in-progress 1m candle from Redis into the last aggregated
+        bucket (in place). If the current candle opens a new bucket, append
+        it as a fresh candle instead.
+        """
+        interval_minutes = TIMEFRAME_MINUTES.get(interval)
+        if not interval_minutes:
+            return
+
+        bucket_sec = interval_minutes * 60
+        current_time = int(current_1m['time'])
+
+        # Same bucket alignment as _aggregate_1m_candles (1w aligns to Monday)
+        if interval == "1w":
+            offset = 345600  # 4 days in seconds
+            bucket_start = (current_time - offset) // bucket_sec * bucket_sec + offset
+        else:
+            bucket_start = current_time // bucket_sec * bucket_sec
+
+        if candles and candles[-1]['time'] == bucket_start:
+            agg = candles[-1]
+            agg['high'] = max(agg['high'], float(current_1m['high']))
+            agg['low'] = min(agg['low'], float(current_1m['low']))
+            agg['close'] = float(current_1m['close'])
+            agg['volume'] += float(current_1m['volume'])
+        else:
+            candles.append({
+                'time': bucket_start,
+                'open': float(current_1m['open']),
+                'high': float(current_1m['high']),
+                'low': float(current_1m['low']),
+                'close': float(current_1m['close']),
+                'volume': float(current_1m['volume'])
+            })
+
+    async def _get_candles_from_1m(
+        self,
+        symbol: str,
+        coin_id: int,
+        interval: str,
+        limit: int
+    ) -> List[dict]:
+        """
+        Fallback path: fetch raw 1m candles and aggregate in-memory.
+        Used when the continuous aggregate for the interval has no data yet.
+        """
+        interval_minutes = TIMEFRAME_MINUTES.get(interval, 5)
+
+        # Calculate how many 1m candles we need
+        # Need: limit * interval_minutes (e.g., 500 5m candles = 2500 1m candles)
+        required_1m_candles = limit * interval_minutes
+
+        # Query 1m candles (closed candles only)
+        async with engine.connect() as conn:
+            query = text("""
+                SELECT
+                    EXTRACT(EPOCH FROM timestamp)::bigint as time,
+                    open, high, low, close, volume
+                FROM candle_data_1m
+                WHERE coin_id = :coin_id
+                ORDER BY timestamp DESC
+                LIMIT :limit
+            """)
+
+            # The Redis current-candle GET is independent of the SQL
+            # query; run both concurrently so the (~1 ms) Redis
+            # round-trip hides inside the DB round-trip.
+            current_1m_key = f"current_candle:{symbol}:1m"
+            result, current_1m_data = await asyncio.gather(
+                conn.execute(query, {
+                    "coin_id": coin_id,
+                    "limit": required_1m_candles
+                }),
+                cache.redis.get(current_1m_key)
+            )
+
+            rows = result.fetchall()
+
+            candles_1m = []
+            if rows:
+                # Convert to list of dicts and reverse (oldest first for aggregation)
+                candles_1m = [
+                    {
+                        'time': row.time,
+                        'open': float(row.open),
+                        'high': float(row.high),
+                        'low': float(row.low),
+                        'close': float(row.close),
+                        'volume': float(row.volume)
+                    }
+                    for row in reversed(rows)
+                ]
+
+            # MERGE current 1m candle from Redis
+            # This provides complete data: historical (DB) + current (Redis)
+            if current_1m_data:
+                try:
+                    current_1m = orjson.loads(current_1m_data)
+                    # Only append if not already in historical data (avoid duplicates)
+                    # candles_1m is sorted ASC, so only the last entry
+                    # can collide with the current candle
+                    current_time = current_1m['time']
+                    if not candles_1m or candles_1m[-1]['time'] != current_time:
+                        candles_1m.append({
+                            'time': current_time,
+                            'open': float(current_1m['open']),
+                            'high': float(current_1m['high']),
+                            'low': float(current_1m['low']),
+                            'close': float(current_1m['close']),
+                            'volume': float(current_1m['volume'])
+                        })
+                except Exception:
+                    logger.warning("Could not parse current 1m candle", exc_info=True)
+
+            if not candles_1m:
+                return []
+
+            return self._aggregate_1m_candles(candles_1m, interval, limit)
+
     async def get_candles(
-        self, 
-        symbol: str, 
-        interval: str, 
+        self,
+        symbol: str,
+        interval: str,
         limit: int = 500
     ) -> List[dict]:
         """
         Get historical candles from TimescaleDB
-        
+
         Strategy:
-        - For 1m: Query directly from candle_data_1m
-        - For other timeframes: Query 1m candles and aggregate in-memory
-          (Same logic as realtime aggregator for consistency)
-        
+        - Query the pre-aggregated table for the interval directly (the
+          TimescaleDB continuous aggregates in TABLE_MAP are maintained
+          incrementally by the storage engine), then fold the current
+          in-progress 1m candle from Redis into the last bucket.
+        - If the aggregate has no rows yet, fall back to fetching raw 1m
+          candles and aggregating in-memory (same logic as realtime
+          aggregator for consistency)
+
         Args:
             symbol: Trading pair (e.g., BTCUSDT)
             interval: Candle interval (1m, 5m, 15m, 1h, 4h, 1d, 1w)
             limit: Number of candles to return
-            
+
         Returns:
             List of candle dictionaries
         """
@@ -122,83 +274,66 @@ class CandleRepository:
         coin_id = await self.get_coin_id(symbol)
         if coin_id is None:
             return []
-        
-        # For non-1m intervals, query 1m candles and aggregate in-memory
+
+        # For non-1m intervals, read the continuous aggregate: only `limit`
+        # pre-reduced rows cross the wire instead of limit * interval_minutes
+        # raw 1m rows
         if interval != "1m":
-            TIMEFRAME_MINUTES = {
-                "5m": 5, "15m": 15, "1h": 60, "4h": 240, "1d": 1440, "1w": 10080
-            }
-            interval_minutes = TIMEFRAME_MINUTES.get(interval, 5)
-            
-            # Calculate how many 1m candles we need
-            # Need: limit * interval_minutes (e.g., 500 5m candles = 2500 1m candles)
-            required_1m_candles = limit * interval_minutes
-            
-            # Query 1m candles (closed candles only)
-            async with async_session() as session:
-                query = text("""
-                    SELECT 
+            table = self.TABLE_MAP.get(interval)
+            if table is None:
+                return []
+
+            async with engine.connect() as conn:
+                query = text(f"""
+                    SELECT
                         EXTRACT(EPOCH FROM timestamp)::bigint as time,
                         open, high, low, close, volume
-                    FROM candle_data_1m
+                    FROM {table}
                     WHERE coin_id = :coin_id
                     ORDER BY timestamp DESC
                     LIMIT :limit
                 """)
-                
-                result = await session.execute(query, {
-                    "coin_id": coin_id,
-                    "limit": required_1m_candles
-                })
-                
-                rows = result.fetchall()
-                
-                candles_1m = []
-                if rows:
-                    # Convert to list of dicts and reverse (oldest first for aggregation)
-                    candles_1m = [
-                        {
-                            'time': row.time,
-                            'open': float(row.open),
-                            'high': float(row.high),
-                            'low': float(row.low),
-                            'close': float(row.close),
-                            'volume': float(row.volume)
-                        }
-                        for row in reversed(rows)
-                    ]
-                
-                # MERGE current 1m candle from Redis
-                # This provides complete data: historical (DB) + current (Redis)
-                import json
+
                 current_1m_key = f"current_candle:{symbol}:1m"
-                current_1m_data = await cache.redis.get(current_1m_key)
-                
-                if current_1m_data:
-                    try:
-                        current_1m = json.loads(current_1m_data)
-                        # Only append if not already in historical data (avoid duplicates)
-                        current_time = current_1m['time']
-                        if not any(c['time'] == current_time for c in candles_1m):
-                            candles_1m.append({
-                                'time': current_time,
-                                'open': float(current_1m['open']),
-                                'high': float(current_1m['high']),
-                                'low': float(current_1m['low']),
-                                'close': float(current_1m['close']),
-                                'volume': float(current_1m['volume'])
-                            })
-                    except Exception as e:
-                        print(f"Warning: Could not parse current 1m candle: {e}")
-                
-                if not candles_1m:
-                    return []
-                
-                # Aggregate in-memory (historical candles only, no current)
-                return self._aggregate_1m_candles(candles_1m, interval, limit)
-        
+                result, current_1m_data = await asyncio.gather(
+                    conn.execute(query, {
+                        "coin_id": coin_id,
+                        "limit": limit
+                    }),
+                    cache.redis.get(current_1m_key)
+                )
+
+                rows = result.fetchall()
+
+            if not rows:
+                # Aggregate not populated (yet) for this coin: aggregate raw
+                # 1m candles in-memory as before
+                return await self._get_candles_from_1m(symbol, coin_id, interval, limit)
+
+            candles = [
+                {
+                    'time': row.time,
+                    'open': float(row.open),
+                    'high': float(row.high),
+                    'low': float(row.low),
+                    'close': float(row.close),
+                    'volume': float(row.volume)
+                }
+                for row in reversed(rows)
+            ]
+
+            # Fold the current in-progress 1m candle into the last bucket
+            if current_1m_data:
+                try:
+                    current_1m = orjson.loads(current_1m_data)
+                    self._merge_current_candle(candles, current_1m, interval)
+                except Exception:
+                    logger.warning("Could not parse current 1m candle", exc_info=True)
+
+            return candles
+
         # For 1m interval, query directly
-        async with async_session() as session:
+        async with engine.connect() as conn:
             query = text("""
                 SELECT 
                     EXTRACT(EPOCH FROM timestamp)::bigint as time,
@@ -209,11 +344,16 @@ class CandleRepository:
                 LIMIT :limit
             """)
             
-            result = await session.execute(query, {
-                "coin_id": coin_id,
-                "limit": limit
-            })
-            
+            # Same as above: overlap the Redis GET with the SQL round-trip
+            current_1m_key = f"current_candle:{symbol}:1m"
+            result, current_1m_data = await asyncio.gather(
+                conn.execute(query, {
+                    "coin_id": coin_id,
+                    "limit": limit
+                }),
+                cache.redis.get(current_1m_key)
+            )
+
             rows = result.fetchall()
             
             # Convert to list of dicts and reverse (oldest first)
@@ -230,15 +370,12 @@ class CandleRepository:
             ]
             
             # MERGE current 1m candle from Redis (same as higher timeframes above)
-            import json
-            current_1m_key = f"current_candle:{symbol}:1m"
-            current_1m_data = await cache.redis.get(current_1m_key)
-            
             if current_1m_data:
                 try:
-                    current_1m = json.loads(current_1m_data)
+                    current_1m = orjson.loads(current_1m_data)
+                    # candles is sorted ASC, so only the last entry can collide
                     current_time = current_1m['time']
-                    if not any(c['time'] == current_time for c in candles):
+                    if not candles or candles[-1]['time'] != current_time:
                         candles.append({
                             'time': current_time,
                             'open': float(current_1m['open']),
@@ -247,7 +384,7 @@ class CandleRepository:
                             'close': float(current_1m['close']),
                             'volume': float(current_1m['volume'])
                         })
-                except Exception as e:
-                    print(f"Warning: Could not parse current 1m candle: {e}")
+                except Exception:
+                    logger.warning("Could not parse current 1m candle", exc_info=True)
             
             return candles
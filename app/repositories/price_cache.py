@@ -1,16 +1,34 @@
-import json
+import orjson
 import redis.asyncio as redis
+import zstandard as zstd
 from app.config import REDIS_HOST, REDIS_PORT, REDIS_DB, REDIS_PASSWORD
 
+# A 1000-candle response is ~150 KB of repetitive numeric JSON; zstd at a
+# low level compresses it 5-10x, shrinking Redis memory and transfer cost.
+_cctx = zstd.ZstdCompressor(level=3)
+_dctx = zstd.ZstdDecompressor()
+
+# First 4 bytes of every zstd frame; lets reads pass through entries written
+# before compression was enabled until they expire
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def _decompress(data: bytes) -> bytes:
+    if data[:4] == _ZSTD_MAGIC:
+        return _dctx.decompress(data)
+    return data
+
+
 class PriceCacheRepository:
 
     def __init__(self):
+        # No decode_responses: orjson consumes the raw bytes directly,
+        # skipping a UTF-8 decode per read.
         self.redis = redis.Redis(
             host=REDIS_HOST,
             port=REDIS_PORT,
             db=REDIS_DB,
-            password=REDIS_PASSWORD,
-            decode_responses=True
+            password=REDIS_PASSWORD
         )
 
     def _key(self, symbol: str, interval: str):
@@ -20,7 +38,7 @@ class PriceCacheRepository:
         key = self._key(symbol, interval)
         data = await self.redis.get(key)
         if data:
-            return json.loads(data)
+            return orjson.loads(_decompress(data))
         return None
 
     async def set(self, symbol: str, interval: str, value, ttl: int = None):
@@ -32,5 +50,43 @@ class PriceCacheRepository:
         await self.redis.setex(
             key,
             ttl,
-            json.dumps(value)
+            _cctx.compress(orjson.dumps(value))
         )
+
+    async def get_raw(self, symbol: str, interval: str):
+        """Cached JSON bytes, decompressed and ready to hand to the client"""
+        data = await self.redis.get(self._key(symbol, interval))
+        if data:
+            return _decompress(data)
+        return None
+
+    async def get_json(self, key: str):
+        """Get a JSON value cached under an arbitrary key"""
+        data = await self.redis.get(key)
+        if data:
+            return orjson.loads(_decompress(data))
+        return None
+
+    async def set_json(self, key: str, value, ttl: int):
+        """Cache a JSON-serializable value under an arbitrary key"""
+        await self.redis.setex(key, ttl, _cctx.compress(orjson.dumps(value)))
+
+    async def mget_json(self, keys):
+        """Fetch many JSON values in a single Redis round-trip.
+
+        Returns a list aligned with keys; missing entries are None.
+        """
+        values = await self.redis.mget(keys)
+        return [
+            orjson.loads(_decompress(v)) if v is not None else None
+            for v in values
+        ]
+
+    async def set_json_many(self, items: dict, ttl: int):
+        """Cache several JSON values in one pipelined round-trip"""
+        if not items:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.setex(key, ttl, _cctx.compress(orjson.dumps(value)))
+            await pipe.execute()
@@ -1,7 +1,51 @@
+import asyncio
+import json
 import httpx
-from app.config import BINANCE_BASE_URL
+import numpy as np
+import orjson
+from app.config import BINANCE_API_URL
 
 class BinanceClient:
+    """
+    Client for the Binance REST API.
+
+    Holds one long-lived httpx.AsyncClient with HTTP/2 enabled so that
+    concurrent requests multiplex over a single TCP+TLS connection instead
+    of opening a socket (and paying a handshake) per call. All outbound
+    Binance traffic should go through this client.
+    """
+
+    # Request paths are constants (base_url handles the host); keeping them
+    # here avoids rebuilding strings on the hot path
+    _KLINES_PATH = "/api/v3/klines"
+    _TICKER_PATH = "/api/v3/ticker/24hr"
+
+    def __init__(self):
+        self._client = httpx.AsyncClient(
+            base_url=BINANCE_API_URL,
+            http2=True,
+            timeout=5.0,
+            # Klines responses are tens of KB of JSON; insist on compression
+            headers={"Accept-Encoding": "gzip, br"},
+            limits=httpx.Limits(
+                max_keepalive_connections=32,
+                max_connections=100,
+                keepalive_expiry=30.0,
+            ),
+        )
+        # Throttle fan-out: an unbounded gather of calls would exhaust
+        # sockets and invite a rate-limit ban. 20 concurrent requests sits
+        # at the keepalive sweet spot for connection reuse.
+        self._sem = asyncio.Semaphore(20)
+
+    async def close(self):
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
 
     async def get_klines(
         self,
@@ -9,14 +53,77 @@ class BinanceClient:
         interval: str,
         limit: int = 500
     ):
-        async with httpx.AsyncClient() as client:
-            # BINANCE_BASE_URL already includes /api/v3
-            url = f"{BINANCE_BASE_URL}/klines"
-            params = {
-                "symbol": symbol,
-                "interval": interval,
-                "limit": limit
-            }
-            resp = await client.get(url, params=params)
-            resp.raise_for_status()
-            return resp.json()
+        # Binance only accepts uppercase symbols; skip the allocation when
+        # the input is already canonical
+        if not symbol.isupper():
+            symbol = symbol.upper()
+        params = {
+            "symbol": symbol,
+            "interval": interval,
+            "limit": limit
+        }
+        async with self._sem:
+            resp = await self._client.get(self._KLINES_PATH, params=params)
+        resp.raise_for_status()
+        # Klines bodies run to hundreds of KB; orjson parses the raw bytes
+        # several times faster than resp.json() and without the detour
+        # through a Python str
+        return orjson.loads(resp.content)
+
+    async def get_klines_columns(
+        self,
+        symbol: str,
+        interval: str,
+        limit: int = 500,
+        dtype=np.float64
+    ):
+        """
+        Klines as columnar (structure-of-arrays) NumPy data.
+
+        Binance returns OHLCV as strings; converting them in one vectorized
+        cast beats per-field float() calls and hands consumers contiguous,
+        SIMD-friendly columns.
+
+        Analytics/ML consumers that don't need full precision can pass
+        dtype=np.float32 to halve the bytes moved through cache and double
+        vector throughput. The default stays float64: API responses
+        round-trip through JSON, and float32's ~7 significant digits would
+        visibly distort USDT prices.
+
+        Returns (open_times int64[N], values dtype[N,5] with columns
+        open/high/low/close/volume, close_times int64[N]).
+        """
+        data = await self.get_klines(symbol, interval, limit)
+        n = len(data)
+        if n == 0:
+            return (
+                np.empty(0, np.int64),
+                np.empty((0, 5), dtype),
+                np.empty(0, np.int64),
+            )
+
+        open_times = np.fromiter((k[0] for k in data), np.int64, count=n)
+        close_times = np.fromiter((k[6] for k in data), np.int64, count=n)
+        values = np.array([k[1:6] for k in data], dtype=dtype)
+        return open_times, values, close_times
+
+    async def get_ticker(self, symbol: str):
+        """24h ticker statistics for a single symbol"""
+        if not symbol.isupper():
+            symbol = symbol.upper()
+        async with self._sem:
+            resp = await self._client.get(
+                self._TICKER_PATH, params={"symbol": symbol}
+            )
+        resp.raise_for_status()
+        return resp.json()
+
+    async def get_tickers(self, symbols: list):
+        """24h ticker statistics for several symbols in one request"""
+        async with self._sem:
+            resp = await self._client.get(
+                self._TICKER_PATH,
+                params={"symbols": json.dumps(symbols, separators=(",", ":"))}
+            )
+        resp.raise_for_status()
+        return resp.json()
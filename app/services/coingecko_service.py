@@ -1,110 +1,254 @@
 import httpx
-from typing import Dict, Any
+from cachetools import TTLCache
+from types import MappingProxyType
+from typing import Any, Dict, List
 import asyncio
 import logging
+import random
 import redis.asyncio as redis
-import json
+import orjson
 from app.config import REDIS_HOST, REDIS_PORT, REDIS_DB, REDIS_PASSWORD
 
 logger = logging.getLogger(__name__)
 
+# Binance symbol -> CoinGecko coin id. Shared and immutable, so per-request
+# service instances don't rebuild it.
+_SYMBOL_MAP = MappingProxyType({
+    "BTCUSDT": "bitcoin",
+    "ETHUSDT": "ethereum",
+    "BNBUSDT": "binancecoin",
+    "SOLUSDT": "solana",
+    "ADAUSDT": "cardano",
+})
+
+# Sentinel distinguishing "not in L1" from a cached None market cap
+_MISSING = object()
+
+# One pool per process: service instances may be created per request (FastAPI
+# DI), but their connections all come from, and are bounded by, this pool
+_REDIS_POOL = redis.ConnectionPool(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=REDIS_DB,
+    password=REDIS_PASSWORD,
+    max_connections=32
+)
+
 class CoinGeckoService:
     def __init__(self):
         self.base_url = "https://api.coingecko.com/api/v3"
-        self.symbol_map = {
-            "BTCUSDT": "bitcoin",
-            "ETHUSDT": "ethereum",
-            "BNBUSDT": "binancecoin",
-            "SOLUSDT": "solana",
-            "ADAUSDT": "cardano",
-        }
-        self.redis_client = None
+        self.http_client = None
         self.cache_ttl = 3600  # 1 hour cache
+        # Failures are cached briefly too, so a burst of calls for a symbol
+        # CoinGecko can't serve becomes Redis hits instead of a retry storm
+        self.negative_ttl = 60
+        # In-flight fetches keyed by symbol (single-flight coalescing)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Bound concurrent CoinGecko calls; the free tier rate-limits hard
+        self._sem = asyncio.Semaphore(10)
+        # L1: process-local TTL cache in front of Redis. Even a local Redis
+        # GET costs a syscall plus a network round-trip; hot symbols become
+        # a dict lookup, with Redis as the shared L2.
+        self._l1 = TTLCache(maxsize=1024, ttl=30)
 
     async def _get_redis(self):
-        if self.redis_client is None:
-            self.redis_client = await redis.Redis(
-                host=REDIS_HOST,
-                port=REDIS_PORT,
-                db=REDIS_DB,
-                password=REDIS_PASSWORD,
-                decode_responses=True
+        # Redis objects are cheap views over the shared pool
+        return redis.Redis(connection_pool=_REDIS_POOL)
+
+    async def _get_http(self):
+        # Lazy like _get_redis: one pooled client per service instance so
+        # retries and subsequent calls reuse the same TLS connection
+        if self.http_client is None:
+            self.http_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=True,
+                timeout=10.0,
+                headers={"Accept-Encoding": "gzip, br"},
+                limits=httpx.Limits(
+                    max_keepalive_connections=10,
+                    max_connections=20
+                )
             )
-        return self.redis_client
+        return self.http_client
+
+    async def close(self):
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
 
     async def get_market_cap(self, symbol: str) -> Dict[str, Any]:
-        coin_id = self.symbol_map.get(symbol)
-        if not coin_id:
-            logger.warning(f"Unknown symbol: {symbol}")
-            return {"symbol": symbol, "marketCap": None}
+        # Single-flight: under a burst of concurrent cache misses for the
+        # same symbol only the first coroutine does the Redis/CoinGecko
+        # dance; the rest await its result.
+        fut = self._inflight.get(symbol)
+        if fut is not None:
+            return await fut
 
-        # Check Redis cache first
-        cache_key = f"market_cap:{symbol}"
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[symbol] = fut
+        try:
+            results = await self.get_market_caps([symbol])
+            fut.set_result(results[0])
+            return results[0]
+        except Exception as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            del self._inflight[symbol]
+
+    async def get_market_caps(self, symbols: List[str]) -> List[Dict[str, Any]]:
+        """
+        Market caps for several symbols with at most one CoinGecko round-trip.
+
+        Cached symbols are served from Redis; the remaining coin ids are
+        batched into a single /simple/price request (the endpoint accepts
+        comma-separated ids) and fanned back out.
+        """
+        results = {symbol: None for symbol in symbols}
+
+        # L1 first (None is a valid cached value, so use a sentinel)
+        pending = []
+        for symbol in symbols:
+            cap = self._l1.get(symbol, _MISSING)
+            if cap is not _MISSING:
+                results[symbol] = cap
+            else:
+                pending.append(symbol)
+
+        if not pending:
+            return [
+                {"symbol": symbol, "marketCap": results[symbol]}
+                for symbol in symbols
+            ]
+
+        # coin_id -> symbol for everything we may need to fetch
+        to_fetch = {}
+        for symbol in pending:
+            coin_id = _SYMBOL_MAP.get(symbol)
+            if not coin_id:
+                logger.warning(f"Unknown symbol: {symbol}")
+                continue
+            to_fetch[coin_id] = symbol
+
+        # Check Redis cache first: all GETs in one pipelined round-trip
         try:
             redis_client = await self._get_redis()
-            cached = await redis_client.get(cache_key)
-            if cached:
-                logger.info(f"Market cap cache HIT for {symbol}")
-                data = json.loads(cached)
-                return {"symbol": symbol, "marketCap": data.get("marketCap")}
+            entries = list(to_fetch.items())
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for coin_id, symbol in entries:
+                    pipe.get(f"market_cap:{symbol}")
+                cached_values = await pipe.execute()
+
+            for (coin_id, symbol), cached in zip(entries, cached_values):
+                if cached:
+                    logger.info(f"Market cap cache HIT for {symbol}")
+                    cap = orjson.loads(cached).get("marketCap")
+                    results[symbol] = cap
+                    self._l1[symbol] = cap
+                    del to_fetch[coin_id]
         except Exception as e:
             logger.error(f"Redis error: {e}")
 
+        if to_fetch:
+            fetched = await self._fetch_market_caps(to_fetch)
+            results.update(fetched)
+            for symbol, cap in fetched.items():
+                self._l1[symbol] = cap
+
+        return [
+            {"symbol": symbol, "marketCap": results[symbol]}
+            for symbol in symbols
+        ]
+
+    async def _cache_negative(self, symbols):
+        """Negative-cache symbols whose fetch failed (short TTL)"""
+        try:
+            redis_client = await self._get_redis()
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for symbol in symbols:
+                    pipe.setex(
+                        f"market_cap:{symbol}",
+                        self.negative_ttl,
+                        orjson.dumps({"marketCap": None})
+                    )
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to cache: {e}")
+
+    async def _fetch_market_caps(self, coin_ids: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Fetch usd market caps for a {coin_id: symbol} mapping in one request
+        and cache them. Returns {symbol: marketCap}.
+        """
         # Retry logic for rate limits
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                async with httpx.AsyncClient(timeout=10.0) as client:
+                client = await self._get_http()
+                async with self._sem:
                     response = await client.get(
-                        f"{self.base_url}/simple/price",
+                        "/simple/price",
                         params={
-                            "ids": coin_id,
+                            "ids": ",".join(coin_ids),
                             "vs_currencies": "usd",
                             "include_market_cap": "true"
                         }
                     )
-                    
-                    if response.status_code == 429:  # Rate limit
-                        if attempt < max_retries - 1:
-                            wait_time = (attempt + 1) * 2
-                            logger.warning(f"Rate limited, retrying in {wait_time}s...")
-                            await asyncio.sleep(wait_time)
-                            continue
-                        logger.error(f"Rate limit exceeded for {symbol}")
-                        return {"symbol": symbol, "marketCap": None}
-                    
-                    if response.status_code != 200:
-                        logger.error(f"CoinGecko error {response.status_code} for {symbol}")
-                        return {"symbol": symbol, "marketCap": None}
-                    
-                    data = response.json()
+
+                if response.status_code == 429:  # Rate limit
+                    if attempt < max_retries - 1:
+                        # Honor Retry-After when CoinGecko sends it; else
+                        # exponential backoff with jitter so concurrent
+                        # clients don't retry in lockstep
+                        try:
+                            wait_time = int(response.headers.get("Retry-After", 0))
+                        except ValueError:
+                            wait_time = 0
+                        if not wait_time:
+                            wait_time = min(2 ** attempt + random.random(), 30)
+                        logger.warning(f"Rate limited, retrying in {wait_time:.1f}s...")
+                        await asyncio.sleep(wait_time)
+                        continue
+                    logger.error(f"Rate limit exceeded for {list(coin_ids.values())}")
+                    await self._cache_negative(coin_ids.values())
+                    return {}
+
+                if response.status_code != 200:
+                    logger.error(f"CoinGecko error {response.status_code}")
+                    return {}
+
+                data = response.json()
+                caps = {}
+                for coin_id, symbol in coin_ids.items():
                     market_cap = data.get(coin_id, {}).get("usd_market_cap")
-                    
                     if market_cap is None:
                         logger.warning(f"No market cap data for {symbol}")
-                    else:
-                        # Cache in Redis for 1 hour
-                        try:
-                            redis_client = await self._get_redis()
-                            await redis_client.setex(
-                                cache_key,
-                                self.cache_ttl,
-                                json.dumps({"marketCap": market_cap})
+                    caps[symbol] = market_cap
+
+                # Cache in Redis: all SETEXs in one round-trip. Missing
+                # values are cached too, just with a much shorter TTL.
+                try:
+                    redis_client = await self._get_redis()
+                    async with redis_client.pipeline(transaction=False) as pipe:
+                        for symbol, market_cap in caps.items():
+                            pipe.setex(
+                                f"market_cap:{symbol}",
+                                self.cache_ttl if market_cap is not None
+                                else self.negative_ttl,
+                                orjson.dumps({"marketCap": market_cap})
                             )
-                            logger.info(f"Cached market cap for {symbol}")
-                        except Exception as e:
-                            logger.error(f"Failed to cache: {e}")
-                    
-                    return {
-                        "symbol": symbol,
-                        "marketCap": market_cap
-                    }
-                    
+                        await pipe.execute()
+                    logger.info(f"Cached market cap for {list(caps)}")
+                except Exception as e:
+                    logger.error(f"Failed to cache: {e}")
+
+                return caps
+
             except Exception as e:
-                logger.error(f"Error fetching market cap for {symbol}: {e}")
+                logger.error(f"Error fetching market caps: {e}")
                 if attempt < max_retries - 1:
-                    await asyncio.sleep(1)
+                    await asyncio.sleep(min(2 ** attempt, 8) + random.random())
                     continue
-                return {"symbol": symbol, "marketCap": None}
-        
-        return {"symbol": symbol, "marketCap": None}
+                return {}
+
+        return {}
@@ -1,4 +1,5 @@
-from datetime import datetime, timedelta
+import time
+from datetime import datetime, timedelta, timezone
 from typing import Tuple
 
 SUPPORTED_INTERVALS = {
@@ -20,24 +21,36 @@ SUPPORTED_INTERVALS = {
 }
 
 
+# Milliseconds per interval, precomputed once so the hot path never touches
+# timedelta arithmetic; doubles as the O(1) membership set for validation
+_INTERVAL_MS = {
+    interval: int(delta.total_seconds() * 1000)
+    for interval, delta in SUPPORTED_INTERVALS.items()
+}
+
+
 def is_supported_interval(interval: str) -> bool:
     """
     Kiểm tra interval có được Binance hỗ trợ không
     """
-    return interval in SUPPORTED_INTERVALS
+    return interval in _INTERVAL_MS
 
 
 def ms_to_datetime(ms: int) -> datetime:
     """
-    Convert timestamp milliseconds → datetime
+    Convert timestamp milliseconds → datetime (UTC, timezone-aware)
     """
-    return datetime.utcfromtimestamp(ms / 1000)
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
 
 
 def datetime_to_ms(dt: datetime) -> int:
     """
     Convert datetime → milliseconds
+
+    Naive datetimes are treated as UTC; aware datetimes are used as-is.
     """
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
     return int(dt.timestamp() * 1000)
 
 
@@ -56,13 +69,10 @@ def get_time_range(
     interval = 1m, limit = 60
     → 60 phút gần nhất
     """
-    if interval not in SUPPORTED_INTERVALS:
+    if interval not in _INTERVAL_MS:
         raise ValueError(f"Unsupported interval: {interval}")
 
-    now = datetime.utcnow()
-    delta = SUPPORTED_INTERVALS[interval] * limit
-
-    start_time = now - delta
-    end_time = now
+    end_time = int(time.time() * 1000)
+    start_time = end_time - _INTERVAL_MS[interval] * limit
 
-    return datetime_to_ms(start_time), datetime_to_ms(end_time)
+    return start_time, end_time